@@ -1,15 +1,343 @@
 import asyncio
+import collections
+import fractions
+import io
 import numpy as np
 import os
+import av
 from aiortc import RTCPeerConnection, RTCSessionDescription, MediaStreamTrack
 from aiortc.contrib.signaling import TcpSocketSignaling
 from av import VideoFrame
 from datetime import datetime, timedelta
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget
+from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QPushButton, QVBoxLayout, QWidget
 from PyQt5.QtCore import QTimer, QThread, pyqtSignal, Qt
 from PyQt5.QtGui import QImage, QPixmap
 import threading
+import time
+
+# Event loop the aiortc receiver runs on:
+#   "thread" - asyncio on its own thread, frames reach Qt through a queued signal
+#   "uvloop" - same as "thread" with uvloop as the asyncio implementation
+#   "qt"     - asyncio on top of the Qt event loop (qasync), frames are delivered
+#              to the window with a direct call on the GUI thread
+EVENT_LOOP = os.environ.get("WEBRTC_EVENT_LOOP", "thread")
+
+# Load shedding: when the estimated queueing delay of a frame exceeds
+# MAX_FRAME_AGE (seconds), frames skip conversion, overlay, saving and display
+# until the delay drops back under RESYNC_FRAME_AGE
+MAX_FRAME_AGE = 0.15
+RESYNC_FRAME_AGE = 0.05
+# Minimum seconds between two keyframe requests
+KEYFRAME_REQUEST_INTERVAL = 1.0
+
+# PyAV decoder threading for H.264 and VP8. Slice threading adds no delay, unlike
+# frame threading which holds back thread_count - 1 frames (aiortc's x264 encoder
+# uses zerolatency, which produces sliced frames; for libvpx it enables threaded
+# decoding of token partitions). 0 lets FFmpeg pick the thread count.
+DECODER_THREAD_TYPE = "SLICE"
+DECODER_THREAD_COUNT = 0
+
+def configure_threaded_decoding(thread_type=DECODER_THREAD_TYPE, thread_count=DECODER_THREAD_COUNT):
+    """Make aiortc's H.264 and VP8 decoders use multithreaded decoding
+
+    aiortc creates its decoders internally, so each PyAV codec context is
+    configured by wrapping the decoder's __init__ (the context is opened lazily
+    on the first packet, so the settings still apply).
+    """
+    from aiortc.codecs import h264, vpx
+
+    for decoder_class in (h264.H264Decoder, vpx.Vp8Decoder):
+        if getattr(decoder_class, "_threading_configured", False):
+            continue
+        original_init = decoder_class.__init__
+
+        def __init__(self, *args, original_init=original_init, **kwargs):
+            original_init(self, *args, **kwargs)
+            try:
+                self.codec.thread_type = thread_type
+                self.codec.thread_count = thread_count
+            except Exception as e:
+                print(f"Could not enable threaded decoding: {str(e)}")
+
+        decoder_class.__init__ = __init__
+        decoder_class._threading_configured = True
+    print(f"Decoding threads: type={thread_type}, count={thread_count or 'auto'}")
+
+def queue_depth(track):
+    """Number of decoded frames waiting in the track (aiortc's RemoteStreamTrack._queue)"""
+    queue = getattr(track, "_queue", None)
+    return queue.qsize() if queue is not None else 0
+
+class OverloadController:
+    """Detects when the receiver falls behind and decides which frames to shed
+
+    The queueing delay is estimated from what the receiver itself observes: the
+    number of decoded frames still waiting in the track times the average time
+    it takes to fully process one frame. Sender timestamps are not used, since
+    the senders stamp frames with a frame counter rather than capture time.
+    """
+
+    # Weight of the newest sample in the processing time average
+    SMOOTHING = 0.1
+
+    def __init__(self, max_frame_age=MAX_FRAME_AGE, resync_frame_age=RESYNC_FRAME_AGE):
+        self.max_frame_age = max_frame_age
+        self.resync_frame_age = resync_frame_age
+        self.processing_time = 0.0
+        self.shedding = False
+        self.resync_pending = False
+        self.frames = 0
+        self.shed_frames = 0
+        self.total_age = 0.0
+        self.max_age = 0.0
+
+    def record_processing(self, seconds):
+        """Record how long a frame that was not shed took to process"""
+        if self.processing_time == 0.0:
+            self.processing_time = seconds
+        else:
+            self.processing_time += self.SMOOTHING * (seconds - self.processing_time)
+
+    def should_shed(self, backlog):
+        """Return True when the receiver is behind and this frame's downstream work should be skipped"""
+        age = backlog * self.processing_time
+        self.frames += 1
+        self.total_age += age
+        self.max_age = max(self.max_age, age)
+
+        if self.shedding and age < self.resync_frame_age:
+            self.shedding = False
+            self.resync_pending = True
+            print(f"Receiver caught up (queueing delay {age * 1000:.1f}ms, backlog {backlog} frames)")
+        elif not self.shedding and age > self.max_frame_age:
+            self.shedding = True
+            print(f"Receiver falling behind (queueing delay {age * 1000:.1f}ms, backlog {backlog} frames), "
+                  f"shedding stale frames")
+
+        if self.shedding:
+            self.shed_frames += 1
+        return self.shedding
+
+    def take_resync(self):
+        """Return True once after the receiver has caught up"""
+        resync, self.resync_pending = self.resync_pending, False
+        return resync
+
+    def report(self):
+        avg_age = self.total_age / self.frames if self.frames else 0.0
+        print(f"Receiver latency: Avg={avg_age * 1000:.2f}ms, Max={self.max_age * 1000:.2f}ms, "
+              f"Processing={self.processing_time * 1000:.2f}ms, Shed={self.shed_frames}/{self.frames} frames")
+        # Every figure covers the frames since the previous report
+        self.frames = 0
+        self.shed_frames = 0
+        self.total_age = 0.0
+        self.max_age = 0.0
+
+# Instant replay: the last REPLAY_SECONDS of the stream are kept as encoded
+# packets (no decode or re-encode), within REPLAY_MAX_BYTES of memory
+REPLAY_SECONDS = 30
+REPLAY_MAX_BYTES = 32 * 1024 * 1024
+# Keyframes are requested from the sender once a GOP gets this long, since
+# aiortc's VP8 encoder only sends one every 3000 frames (100 s at 30 fps) on its
+# own. An export covers at most REPLAY_SECONDS + REPLAY_MAX_GOP_SECONDS.
+REPLAY_MAX_GOP_SECONDS = 5
+REPLAY_DIR = "replays"
+# Writing every decoded frame as a JPEG to imgs/ is opt-in, the replay buffer covers incidents
+SAVE_FRAMES = os.environ.get("WEBRTC_SAVE_FRAMES") == "1"
+
+# RTP clock rate of aiortc's video codecs
+VIDEO_CLOCK_RATE = 90000
+
+def is_h264_keyframe(data):
+    """Return True if the Annex B access unit contains an IDR slice"""
+    index = data.find(b"\x00\x00\x01")
+    while index != -1 and index + 3 < len(data):
+        if data[index + 3] & 0x1F == 5:
+            return True
+        index = data.find(b"\x00\x00\x01", index + 3)
+    return False
+
+def is_vp8_keyframe(data):
+    # Bit 0 of the VP8 frame tag is 0 for key frames
+    return len(data) > 0 and data[0] & 0x01 == 0
+
+def vp8_dimensions(data):
+    """Return (width, height) from a VP8 key frame header, or None"""
+    if len(data) < 10 or data[3:6] != b"\x9d\x01\x2a":
+        return None
+    width = int.from_bytes(data[6:8], "little") & 0x3FFF
+    height = int.from_bytes(data[8:10], "little") & 0x3FFF
+    return width, height
+
+class ReplayBuffer:
+    """Memory-bounded ring buffer of the most recent encoded video packets
+
+    Packets are grouped by GOP (a keyframe and the frames that depend on it) and
+    only whole GOPs are evicted, so the buffer always starts on a keyframe and
+    any export is decodable. GOP length is up to the encoder, so keyframe_needed
+    is raised when the newest GOP gets too long, or the buffer is waiting for a
+    keyframe, for the receiver to request one. Packets are added from aiortc's
+    decoder thread, so all state is guarded by a lock.
+    """
+
+    def __init__(self, seconds=REPLAY_SECONDS, max_bytes=REPLAY_MAX_BYTES, max_gop_seconds=REPLAY_MAX_GOP_SECONDS):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.max_gop_seconds = max_gop_seconds
+        self.keyframe_needed = False
+        self.lock = threading.Lock()
+        self.codec = None
+        self.dimensions = None
+        self.gops = collections.deque()
+        self.size = 0
+
+    def clear(self):
+        self.gops.clear()
+        self.size = 0
+
+    def add(self, codec, timestamp, data, keyframe):
+        with self.lock:
+            if codec != self.codec:
+                # New stream, the old packets cannot be muxed together with it
+                self.clear()
+                self.codec = codec
+                self.dimensions = None
+            if keyframe:
+                self.keyframe_needed = False
+                if codec == "vp8":
+                    self.dimensions = vp8_dimensions(data) or self.dimensions
+                self.gops.append([])
+            elif not self.gops:
+                # Nothing to decode this packet against, wait for a keyframe
+                self.keyframe_needed = True
+                return
+            self.gops[-1].append((timestamp, data))
+            self.size += len(data)
+            self.trim()
+
+    def duration(self, first_timestamp, last_timestamp):
+        # RTP timestamps are 32-bit and wrap around
+        return ((last_timestamp - first_timestamp) % 2**32) / VIDEO_CLOCK_RATE
+
+    def trim(self):
+        last_timestamp = self.gops[-1][-1][0]
+        # Drop the oldest GOP while the remaining ones still cover the window
+        while len(self.gops) > 1 and self.duration(self.gops[1][0][0], last_timestamp) >= self.seconds:
+            self.drop_oldest_gop()
+        # The memory budget is a hard limit, even if it costs part of the window
+        while self.gops and self.size > self.max_bytes:
+            self.drop_oldest_gop()
+        if not self.gops:
+            # The newest GOP alone exceeded the budget, add() waits for the next keyframe
+            self.keyframe_needed = True
+        elif self.duration(self.gops[-1][0][0], last_timestamp) >= self.max_gop_seconds:
+            self.keyframe_needed = True
+
+    def take_keyframe_request(self):
+        """Return True once when a keyframe should be requested from the sender"""
+        with self.lock:
+            needed, self.keyframe_needed = self.keyframe_needed, False
+            return needed
+
+    def drop_oldest_gop(self):
+        gop = self.gops.popleft()
+        self.size -= sum(len(data) for _, data in gop)
+
+    def snapshot(self):
+        """Return (codec, dimensions, packets) for the buffered window"""
+        with self.lock:
+            packets = [packet for gop in self.gops for packet in gop]
+            return self.codec, self.dimensions, packets
+
+    def export(self, path=None):
+        """Write the buffered window to a Matroska file and return its path
+
+        Only a snapshot is taken under the lock, so reception continues while the
+        clip is written. Packets are remuxed as-is, nothing is re-encoded.
+        """
+        codec, dimensions, packets = self.snapshot()
+        if not packets:
+            print("Replay buffer is empty, nothing to export")
+            return None
+        if path is None:
+            os.makedirs(REPLAY_DIR, exist_ok=True)
+            path = os.path.join(REPLAY_DIR, f"replay_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}.mkv")
+
+        # Wrap the packets in an elementary stream so FFmpeg fills in the codec
+        # parameters (dimensions, SPS/PPS) that the output stream needs
+        if codec == "h264":
+            elementary = io.BytesIO(b"".join(data for _, data in packets))
+            input_format = "h264"
+        else:
+            elementary = io.BytesIO(ivf_stream(packets, dimensions or (0, 0)))
+            input_format = "ivf"
+
+        first_timestamp = packets[0][0]
+        time_base = fractions.Fraction(1, VIDEO_CLOCK_RATE)
+        with av.open(elementary, "r", format=input_format) as input_container, av.open(path, "w") as output_container:
+            input_stream = input_container.streams.video[0]
+            if hasattr(output_container, "add_stream_from_template"):
+                output_stream = output_container.add_stream_from_template(input_stream)
+            else:
+                output_stream = output_container.add_stream(template=input_stream)
+            index = 0
+            for packet in input_container.demux(input_stream):
+                if packet.size == 0 or index >= len(packets):
+                    continue
+                pts = (packets[index][0] - first_timestamp) % 2**32
+                packet.pts = packet.dts = pts
+                packet.time_base = time_base
+                packet.stream = output_stream
+                output_container.mux(packet)
+                index += 1
+
+        duration = self.duration(first_timestamp, packets[-1][0])
+        print(f"Saved {duration:.1f}s replay ({len(packets)} frames, {codec}) to {path}")
+        return path
+
+def ivf_stream(packets, dimensions):
+    """Build an in-memory IVF file (VP8) from (timestamp, data) packets"""
+    width, height = dimensions
+    header = (b"DKIF" + (0).to_bytes(2, "little") + (32).to_bytes(2, "little") + b"VP80"
+              + width.to_bytes(2, "little") + height.to_bytes(2, "little")
+              + VIDEO_CLOCK_RATE.to_bytes(4, "little") + (1).to_bytes(4, "little")
+              + len(packets).to_bytes(4, "little") + bytes(4))
+    first_timestamp = packets[0][0]
+    frames = [
+        len(data).to_bytes(4, "little") + ((timestamp - first_timestamp) % 2**32).to_bytes(8, "little") + data
+        for timestamp, data in packets
+    ]
+    return header + b"".join(frames)
+
+def install_replay_hooks(replay_buffer):
+    """Feed every encoded frame aiortc decodes into the replay buffer
+
+    Like configure_threaded_decoding(), this wraps aiortc's decoder classes since
+    the receiver never sees encoded frames otherwise. Runs on the decoder thread.
+    """
+    from aiortc.codecs import h264, vpx
+
+    for decoder_class, codec, is_keyframe in (
+        (h264.H264Decoder, "h264", is_h264_keyframe),
+        (vpx.Vp8Decoder, "vp8", is_vp8_keyframe),
+    ):
+        if getattr(decoder_class, "_replay_hooked", False):
+            continue
+        original_decode = decoder_class.decode
+
+        def decode(self, encoded_frame, original_decode=original_decode, codec=codec, is_keyframe=is_keyframe):
+            try:
+                data = bytes(encoded_frame.data)
+                replay_buffer.add(codec, encoded_frame.timestamp, data, is_keyframe(data))
+            except Exception as e:
+                print(f"Error buffering frame for replay: {str(e)}")
+            return original_decode(self, encoded_frame)
+
+        decoder_class.decode = decode
+        decoder_class._replay_hooked = True
+
+replay_buffer = ReplayBuffer()
 
 class VideoDisplayThread(QThread):
     frame_received = pyqtSignal(np.ndarray)
@@ -26,10 +354,11 @@ class VideoDisplayThread(QThread):
         self.running = False
 
 class VideoWindow(QMainWindow):
-    frame_update_signal = pyqtSignal(np.ndarray)
+    frame_update_signal = pyqtSignal()
     
-    def __init__(self):
+    def __init__(self, replay_buffer=None):
         super().__init__()
+        self.replay_buffer = replay_buffer
         self.setWindowTitle("WebRTC Video Receiver")
         self.setGeometry(100, 100, 800, 600)
         
@@ -49,11 +378,22 @@ class VideoWindow(QMainWindow):
         self.status_label = QLabel("Waiting for video stream...")
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(self.status_label)
+
+        # Save the last REPLAY_SECONDS of the stream to REPLAY_DIR
+        if self.replay_buffer is not None:
+            self.replay_button = QPushButton(f"Save last {REPLAY_SECONDS}s")
+            self.replay_button.clicked.connect(self.save_replay)
+            layout.addWidget(self.replay_button)
         
         self.frame_count = 0
+        self.gui_thread_id = threading.get_ident()
+        # Latest frame waiting for the GUI thread; frames replaced before it got
+        # there are never displayed, so a slow GUI cannot build up a backlog
+        self.pending_frame = None
+        self.pending_lock = threading.Lock()
         
         # Connect signal to slot
-        self.frame_update_signal.connect(self.update_frame_slot)
+        self.frame_update_signal.connect(self.show_pending_frame)
     
     def update_frame_slot(self, frame):
         """Update the video display with a new frame (called from main thread)"""
@@ -81,15 +421,43 @@ class VideoWindow(QMainWindow):
         except Exception as e:
             print(f"Error updating frame: {str(e)}")
     
+    def save_replay(self):
+        """Export the replay buffer without blocking the GUI or reception"""
+        def export():
+            try:
+                self.replay_buffer.export()
+            except Exception as e:
+                print(f"Error saving replay: {str(e)}")
+        threading.Thread(target=export, daemon=True).start()
+
+    def show_pending_frame(self):
+        """Display the latest frame handed over by update_frame (called from main thread)"""
+        with self.pending_lock:
+            frame, self.pending_frame = self.pending_frame, None
+        if frame is not None:
+            self.update_frame_slot(frame)
+
     def update_frame(self, frame):
-        """Emit signal to update frame from any thread"""
-        self.frame_update_signal.emit(frame)
+        """Update the frame from any thread, directly when already on the GUI thread"""
+        if threading.get_ident() == self.gui_thread_id:
+            self.update_frame_slot(frame)
+            return
+        with self.pending_lock:
+            signal_queued = self.pending_frame is not None
+            self.pending_frame = frame
+        # At most one queued signal at a time, it always shows the newest frame
+        if not signal_queued:
+            self.frame_update_signal.emit()
 
 class VideoReceiver:
-    def __init__(self, video_window):
+    def __init__(self, video_window, replay_buffer=None):
         self.track = None
+        self.replay_buffer = replay_buffer
+        self.rtp_receiver = None
         self.video_window = video_window
         self.running = True
+        self.overload = OverloadController()
+        self.last_keyframe_request = 0.0
     
     def stop(self):
         """Stop the video receiver"""
@@ -97,9 +465,24 @@ class VideoReceiver:
         if self.track:
             self.track.stop()
 
-    async def handle_track(self, track):
+    async def request_keyframe(self):
+        """Ask the sender for a keyframe (RTCP PLI) to resync the picture"""
+        now = time.monotonic()
+        if self.rtp_receiver is None or now - self.last_keyframe_request < KEYFRAME_REQUEST_INTERVAL:
+            return
+        self.last_keyframe_request = now
+        try:
+            for source in self.rtp_receiver.getSynchronizationSources():
+                # aiortc has no public API for this, PLI is what its own jitter buffer sends
+                await self.rtp_receiver._send_rtcp_pli(source.source)
+            print("Requested keyframe from sender")
+        except Exception as e:
+            print(f"Could not request keyframe: {str(e)}")
+
+    async def handle_track(self, track, rtp_receiver=None):
         print("Inside handle track")
         self.track = track
+        self.rtp_receiver = rtp_receiver
         frame_count = 0
         consecutive_errors = 0
         max_consecutive_errors = 10
@@ -120,6 +503,20 @@ class VideoReceiver:
                 frame_count += 1
                 consecutive_errors = 0  # Reset error counter on successful frame
                 print(f"Received frame {frame_count}")
+
+                if isinstance(frame, VideoFrame):
+                    shed = self.overload.should_shed(queue_depth(track))
+                    if frame_count % 30 == 0:
+                        self.overload.report()
+                    if self.overload.take_resync():
+                        await self.request_keyframe()
+                    elif self.replay_buffer is not None and self.replay_buffer.take_keyframe_request():
+                        # Bound the GOP length so the replay window stays close to REPLAY_SECONDS
+                        await self.request_keyframe()
+                    if shed:
+                        # Stale frame, skip conversion and everything downstream
+                        continue
+                processing_start = time.monotonic()
                 
                 if isinstance(frame, VideoFrame):
                     print(f"Frame type: VideoFrame, pts: {frame.pts}, time_base: {frame.time_base}")
@@ -141,11 +538,13 @@ class VideoReceiver:
                 cv2.putText(frame, timestamp, (10, frame.shape[0] - 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
                 
                 # Save frame to file
-                cv2.imwrite(f"imgs/received_frame_{frame_count}.jpg", frame)
-                print(f"Saved frame {frame_count} to file")
+                if SAVE_FRAMES:
+                    cv2.imwrite(f"imgs/received_frame_{frame_count}.jpg", frame)
+                    print(f"Saved frame {frame_count} to file")
                 
                 # Update Qt window with new frame
                 self.video_window.update_frame(frame)
+                self.overload.record_processing(time.monotonic() - processing_start)
     
             except asyncio.TimeoutError:
                 print("Timeout waiting for frame, continuing...")
@@ -174,7 +573,8 @@ async def run(pc, signaling, video_window):
     def on_track(track):
         if isinstance(track, MediaStreamTrack):
             print(f"Receiving {track.kind} track")
-            asyncio.ensure_future(video_receiver.handle_track(track))
+            rtp_receiver = next((r for r in pc.getReceivers() if r.track is track), None)
+            asyncio.ensure_future(video_receiver.handle_track(track, rtp_receiver))
 
     @pc.on("datachannel")
     def on_datachannel(channel):
@@ -220,24 +620,48 @@ async def run(pc, signaling, video_window):
     finally:
         print("Closing connection")
 
+async def receive_video(video_window):
+    signaling = TcpSocketSignaling("10.10.1.100", 9999)
+    configure_threaded_decoding()
+    install_replay_hooks(replay_buffer)
+    pc = RTCPeerConnection()
+    
+    global video_receiver
+    video_receiver = VideoReceiver(video_window, replay_buffer)
+
+    try:
+        await run(pc, signaling, video_window)
+    except Exception as e:
+        print(f"Error in main: {str(e)}")
+    finally:
+        print("Closing peer connection")
+        await pc.close()
+
 def run_webrtc_async(video_window):
     """Run the WebRTC receiver in a separate thread"""
-    async def async_main():
-        signaling = TcpSocketSignaling("10.10.1.100", 9999)
-        pc = RTCPeerConnection()
-        
-        global video_receiver
-        video_receiver = VideoReceiver(video_window)
+    loop_factory = None
+    if EVENT_LOOP == "uvloop":
+        import uvloop
+        loop_factory = uvloop.new_event_loop
+        print("Running asyncio on uvloop")
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(receive_video(video_window))
 
-        try:
-            await run(pc, signaling, video_window)
-        except Exception as e:
-            print(f"Error in main: {str(e)}")
-        finally:
-            print("Closing peer connection")
-            await pc.close()
-    
-    asyncio.run(async_main())
+def run_webrtc_on_qt(app, video_window):
+    """Run the WebRTC receiver on the Qt event loop until the window is closed"""
+    import qasync
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    print("Running asyncio on the Qt event loop (qasync)")
+
+    app.lastWindowClosed.connect(loop.stop)
+    with loop:
+        task = loop.create_task(receive_video(video_window))
+        loop.run_forever()
+        # Window closed while still receiving, let the peer connection close cleanly
+        if not task.done():
+            task.cancel()
+            loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
 
 async def main():
     # Set Qt platform to wayland if running on Wayland
@@ -248,7 +672,7 @@ async def main():
     app = QApplication(sys.argv)
     
     # Create video window
-    video_window = VideoWindow()
+    video_window = VideoWindow(replay_buffer)
     video_window.show()
     
     # Start WebRTC receiver in a separate thread
@@ -259,8 +683,26 @@ async def main():
     # Start Qt event loop
     sys.exit(app.exec_())
 
+def main_integrated():
+    # Set Qt platform to wayland if running on Wayland
+    if "WAYLAND_DISPLAY" in os.environ:
+        os.environ["QT_QPA_PLATFORM"] = "wayland"
+
+    app = QApplication(sys.argv)
+
+    video_window = VideoWindow(replay_buffer)
+    video_window.show()
+
+    # WebRTC and Qt share the GUI thread, no receiver thread is started
+    run_webrtc_on_qt(app, video_window)
+
 if __name__ == "__main__":
     # Import cv2 here since we still need it for timestamp overlay
     import cv2
     
-    asyncio.run(main())
\ No newline at end of file
+    if EVENT_LOOP == "qt":
+        main_integrated()
+    elif EVENT_LOOP in ("thread", "uvloop"):
+        asyncio.run(main())
+    else:
+        raise ValueError(f"Unknown WEBRTC_EVENT_LOOP {EVENT_LOOP!r}, expected thread, uvloop or qt")
\ No newline at end of file
@@ -1,31 +1,162 @@
+import time
+
+# Taken before any heavy import so time-to-first-frame covers the whole startup
+PROCESS_START = time.monotonic()
+
 import asyncio
 # Remove cv2 import
 # import cv2
+import hashlib
+import json
+import os
 import numpy as np
 from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
 from aiortc.contrib.signaling import TcpSocketSignaling
+from aiortc.mediastreams import MediaStreamError
 from av import VideoFrame
 import fractions
 from datetime import datetime
-import time
+import threading
 
-import gi
+# GStreamer (gi) is loaded on first use, see load_gstreamer()
+# (PyAV is already pulled in by aiortc, so there is nothing to gain deferring it)
+Gst = None
+GLib = None
+main_loop = None
+main_loop_thread = None
 
-# Set GStreamer version and import Gst, GLib at the top level for linter
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GLib
+# Event loop the sender runs on:
+#   "asyncio" - default asyncio loop, GLib MainLoop on its own thread
+#   "uvloop"  - uvloop instead of the default asyncio loop (headless nodes)
+#   "glib"    - asyncio on top of the GLib main context (gbulb), no extra thread
+EVENT_LOOP = os.environ.get("WEBRTC_EVENT_LOOP", "asyncio")
 
-# Ensure GStreamer is available at runtime
-try:
-    Gst.init(None)
-except Exception as e:
-    raise RuntimeError("GStreamer could not be initialized. Ensure GStreamer is installed on your system.") from e
+CAPABILITY_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "webrtc-python",
+    "gst_capabilities.json",
+)
+
+# Elements probed once and cached, in order of preference
+ENCODER_CANDIDATES = ["qsvh264enc", "vaapih264enc"]
+SOURCE_CANDIDATES = ["v4l2src"]
+
+
+def load_gstreamer():
+    """Import and initialize GStreamer, and start the GLib MainLoop thread (once)
+
+    With EVENT_LOOP == "glib" the asyncio loop already iterates the GLib main
+    context, so no separate MainLoop thread is started.
+    """
+    global Gst, GLib, main_loop, main_loop_thread
+    if Gst is not None:
+        return Gst
+
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst as _Gst, GLib as _GLib
+
+    # Ensure GStreamer is available at runtime
+    try:
+        _Gst.init(None)
+    except Exception as e:
+        raise RuntimeError("GStreamer could not be initialized. Ensure GStreamer is installed on your system.") from e
+
+    if EVENT_LOOP != "glib":
+        # Start GLib MainLoop in a background thread for GStreamer event processing
+        main_loop = _GLib.MainLoop()
+        main_loop_thread = threading.Thread(target=main_loop.run, daemon=True)
+        main_loop_thread.start()
+
+    Gst, GLib = _Gst, _GLib
+    return Gst
+
+
+class CapabilityRegistry:
+    """Encoders and sources available on this machine, probed once and cached on disk.
+
+    The cache is keyed by the GStreamer version and the set of installed plugins,
+    so installing or removing a plugin (or upgrading GStreamer) triggers a new probe.
+    """
+
+    def __init__(self, cache_path=CAPABILITY_CACHE_PATH):
+        self.cache_path = cache_path
+        self.capabilities = None
+        self.key = None
+        self.from_cache = False
+
+    def cache_key(self):
+        registry = Gst.Registry.get()
+        plugins = sorted(
+            f"{plugin.get_name()}:{plugin.get_version()}"
+            for plugin in registry.get_plugin_list()
+        )
+        digest = hashlib.sha1("\n".join(plugins).encode("utf-8")).hexdigest()
+        return f"{Gst.version_string()}/{digest}"
+
+    def load(self):
+        """Return the capabilities, from the cache when it matches, otherwise by probing"""
+        if self.capabilities is not None:
+            return self.capabilities
+
+        key = self.key = self.cache_key()
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+            if cached.get("key") == key:
+                self.capabilities = cached["capabilities"]
+                self.from_cache = True
+                return self.capabilities
+        except (OSError, ValueError, KeyError):
+            pass
+
+        self.capabilities = {
+            "encoders": {name: self.probe(name) for name in ENCODER_CANDIDATES},
+            "sources": {name: self.probe(name) for name in SOURCE_CANDIDATES},
+        }
+        self.from_cache = False
+        self.save(key)
+        return self.capabilities
+
+    def save(self, key):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"key": key, "capabilities": self.capabilities}, f, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not write capability cache {self.cache_path}: {e}")
+
+    def mark_unavailable(self, encoder_name):
+        """Record that an encoder failed to start, so later launches skip it
+
+        Installed is not the same as usable (e.g. no GPU), which only shows once
+        the pipeline starts. The entry stays until the plugin set changes or the
+        cache file is deleted.
+        """
+        self.load()["encoders"][encoder_name] = False
+        self.save(self.key)
+
+    @staticmethod
+    def probe(element_name):
+        # Looking up the factory is enough to know the plugin is installed, and
+        # avoids building a throwaway pipeline around the element
+        factory = Gst.ElementFactory.find(element_name)
+        if factory is None:
+            return False
+        element = factory.create(None)
+        if element is None:
+            return False
+        element.set_state(Gst.State.NULL)
+        return True
+
+    def has_encoder(self, name):
+        return self.load()["encoders"].get(name, False)
+
+    def has_source(self, name):
+        return self.load()["sources"].get(name, False)
 
-# Start GLib MainLoop in a background thread for GStreamer event processing
-import threading
-main_loop = GLib.MainLoop()
-main_loop_thread = threading.Thread(target=main_loop.run, daemon=True)
-main_loop_thread.start()
 
 class CustomVideoStreamTrack(VideoStreamTrack):
     def __init__(self, camera_id):
@@ -36,62 +167,131 @@ class CustomVideoStreamTrack(VideoStreamTrack):
         self.total_processing_time = 0
         self.frame_times = []
         
+        self.first_sample_time = None
+        self.first_frame_reported = False
+
+        self.camera_id = camera_id
+        self.encoder = None
+        self.bus = None
+        self.latest_frame = None
+        # Set on the event loop thread whenever latest_frame is replaced
+        self.frame_ready = asyncio.Event()
+        # GStreamer init, capability probe and pipeline start run on a worker
+        # thread, overlapping with signaling and ICE/DTLS instead of delaying them
+        self.startup = self.loop.run_in_executor(None, self.start_gstreamer)
+
+    def start_gstreamer(self):
+        init_start = time.monotonic()
+        load_gstreamer()
+        self.gst_init_time = (time.monotonic() - init_start) * 1000
+
+        probe_start = time.monotonic()
+        self.capabilities = CapabilityRegistry()
+        self.capabilities.load()
+        self.probe_time = (time.monotonic() - probe_start) * 1000
+        print(f"Encoder capabilities {'loaded from cache' if self.capabilities.from_cache else 'probed'} "
+              f"in {self.probe_time:.2f}ms (GStreamer init {self.gst_init_time:.2f}ms)")
+
+        self.start_pipeline()
+
+    def encoder_candidates(self):
+        """Usable encoders in order of preference, None being software encoding"""
         # Try Intel hardware acceleration first, fallback to software if not available
-        try:
-            # Test if qsvh264enc is available
-            test_pipeline = Gst.parse_launch("fakesrc ! qsvh264enc ! fakesink")
-            test_pipeline.set_state(Gst.State.NULL)
-            del test_pipeline
-            
+        return [name for name in ENCODER_CANDIDATES if self.capabilities.has_encoder(name)] + [None]
+
+    def start_pipeline(self, skip_encoders=()):
+        for encoder in self.encoder_candidates():
+            if encoder in skip_encoders:
+                continue
+            try:
+                pipeline = self.create_pipeline(self.camera_id, encoder)
+            except Exception as e:
+                if encoder is None:
+                    raise
+                print(f"Could not create {encoder} pipeline: {e}")
+                continue
+
+            self.pipeline = pipeline
+            self.encoder = encoder
+            self.appsink = self.pipeline.get_by_name('sink')
+            self.appsink.connect('new-sample', self.on_new_sample)
+            self.bus = self.pipeline.get_bus()
+            if self.pipeline.set_state(Gst.State.PLAYING) != Gst.StateChangeReturn.FAILURE:
+                # Add bus message handler for errors and state changes, messages
+                # posted while starting are still queued and get dispatched
+                self.bus.add_signal_watch()
+                self.bus.connect('message', self.on_bus_message)
+                return
+
+            # No signal watch yet, so the error explaining the failure is still on the bus
+            message = self.bus.pop_filtered(Gst.MessageType.ERROR)
+            self.pipeline.set_state(Gst.State.NULL)
+            if message is None:
+                reason, failed_element = "unknown error", None
+            else:
+                reason, failed_element = message.parse_error()[0], message.src.get_name()
+            print(f"Pipeline with {encoder or 'software encoding'} failed to start: {reason}")
+            # Only blame the encoder when it is what failed, a busy camera (e.g. still
+            # held by the previous process during a restart) must not poison the cache
+            if encoder is None or failed_element not in ("encoder", "postproc"):
+                raise RuntimeError(f"GStreamer pipeline could not be started: {reason}")
+            self.capabilities.mark_unavailable(encoder)
+        raise RuntimeError("No GStreamer pipeline could be started")
+
+    def stop_pipeline(self):
+        self.bus.remove_signal_watch()
+        self.pipeline.set_state(Gst.State.NULL)
+
+    def fall_back_from(self, encoder):
+        """Replace a pipeline whose hardware encoder failed at runtime (runs on the event loop)"""
+        if self.encoder != encoder:
+            # Already replaced after an earlier error from the same pipeline
+            return
+        print(f"{encoder} failed, falling back to the next encoder")
+        self.capabilities.mark_unavailable(encoder)
+        self.stop_pipeline()
+        self.start_pipeline(skip_encoders=(encoder,))
+
+    def create_pipeline(self, camera_id, encoder):
+        if encoder == "qsvh264enc":
             # Use Intel Quick Sync hardware acceleration
-            self.pipeline = Gst.parse_launch(
+            pipeline = Gst.parse_launch(
                 f"v4l2src device=/dev/video{camera_id} ! "
                 f"video/x-raw,format=NV12,width=640,height=480,framerate=30/1 ! "
-                f"qsvh264enc bitrate=1000 ! "  # Intel hardware H.264 encoding
+                f"qsvh264enc name=encoder bitrate=1000 ! "  # Intel hardware H.264 encoding
                 f"appsink name=sink emit-signals=true max-buffers=1 drop=true"
             )
             print("Using Intel Quick Sync hardware acceleration")
-        except Exception as e:
-            print(f"Intel Quick Sync not available: {e}")
-            try:
-                # Try VA-API hardware acceleration
-                test_pipeline = Gst.parse_launch("fakesrc ! vaapih264enc ! fakesink")
-                test_pipeline.set_state(Gst.State.NULL)
-                del test_pipeline
-                
-                self.pipeline = Gst.parse_launch(
-                    f"v4l2src device=/dev/video{camera_id} ! "
-                    f"videoconvert ! "
-                    f"vaapipostproc ! "  # VA-API post-processing
-                    f"vaapih264enc ! "   # VA-API H.264 encoding
-                    f"appsink name=sink emit-signals=true max-buffers=1 drop=true"
-                )
-                print("Using VA-API hardware acceleration")
-            except Exception as e2:
-                print(f"VA-API not available: {e2}")
-                # Fallback to software encoding
-                self.pipeline = Gst.parse_launch(
-                    f"v4l2src device=/dev/video{camera_id} ! "
-                    f"videoconvert ! "
-                    f"video/x-raw,format=RGB,width=640,height=480,framerate=30/1 ! "
-                    f"appsink name=sink emit-signals=true max-buffers=1 drop=true"
-                )
-                print("Using software encoding (no hardware acceleration)")
-        
-        self.appsink = self.pipeline.get_by_name('sink')
-        self.appsink.connect('new-sample', self.on_new_sample)
-        self.latest_frame = None
-        # Add bus message handler for errors and state changes
-        self.bus = self.pipeline.get_bus()
-        self.bus.add_signal_watch()
-        self.bus.connect('message', self.on_bus_message)
-        self.pipeline.set_state(Gst.State.PLAYING)
+        elif encoder == "vaapih264enc":
+            pipeline = Gst.parse_launch(
+                f"v4l2src device=/dev/video{camera_id} ! "
+                f"videoconvert ! "
+                f"vaapipostproc name=postproc ! "  # VA-API post-processing
+                f"vaapih264enc name=encoder ! "   # VA-API H.264 encoding
+                f"appsink name=sink emit-signals=true max-buffers=1 drop=true"
+            )
+            print("Using VA-API hardware acceleration")
+        else:
+            if not self.capabilities.has_source("v4l2src"):
+                print("v4l2src not available, the pipeline will fail to start")
+            # Fallback to software encoding
+            pipeline = Gst.parse_launch(
+                f"v4l2src device=/dev/video{camera_id} ! "
+                f"videoconvert ! "
+                f"video/x-raw,format=RGB,width=640,height=480,framerate=30/1 ! "
+                f"appsink name=sink emit-signals=true max-buffers=1 drop=true"
+            )
+            print("Using software encoding (no hardware acceleration)")
+        return pipeline
 
     def on_bus_message(self, bus, message):
         t = message.type
         if t == Gst.MessageType.ERROR:
             err, debug = message.parse_error()
             print(f"GStreamer ERROR: {err}, debug info: {debug}")
+            # Hardware encoders can be installed but unusable, which only shows here
+            if bus == self.bus and self.encoder is not None and message.src.get_name() in ("encoder", "postproc"):
+                self.loop.call_soon_threadsafe(self.fall_back_from, self.encoder)
         elif t == Gst.MessageType.STATE_CHANGED:
             old, new, pending = message.parse_state_changed()
             if message.src == self.pipeline:
@@ -100,13 +300,25 @@ class CustomVideoStreamTrack(VideoStreamTrack):
             print("GStreamer End-Of-Stream reached")
 
     def on_new_sample(self, sink):
+        if self.first_sample_time is None:
+            self.report_first_sample()
         sample = sink.emit('pull-sample')
         buf = sample.get_buffer()
         caps = sample.get_caps()
         arr = self.gst_buffer_to_ndarray(buf, caps)
-        self.latest_frame = arr
+        # new-sample fires on a GStreamer streaming thread, hand the frame over to
+        # the event loop instead of sharing latest_frame between threads
+        try:
+            self.loop.call_soon_threadsafe(self.deliver_frame, arr)
+        except RuntimeError:
+            # Event loop already closed during shutdown
+            pass
         return Gst.FlowReturn.OK
 
+    def deliver_frame(self, arr):
+        self.latest_frame = arr
+        self.frame_ready.set()
+
     def gst_buffer_to_ndarray(self, buf, caps):
         # Get video info
         structure = caps.get_structure(0)
@@ -123,18 +335,46 @@ class CustomVideoStreamTrack(VideoStreamTrack):
         finally:
             buf.unmap(map_info)
 
+    def report_first_sample(self):
+        # Sender startup proper: process start until the camera delivers a frame
+        self.first_sample_time = time.monotonic()
+        time_to_first_sample = (self.first_sample_time - PROCESS_START) * 1000
+        print(f"Startup: time to first camera frame={time_to_first_sample:.2f}ms "
+              f"(GStreamer init={self.gst_init_time:.2f}ms, capability probe={self.probe_time:.2f}ms, "
+              f"cached={self.capabilities.from_cache})")
+
+    def report_time_to_first_frame(self):
+        # Also includes waiting for the receiver's answer and ICE/DTLS
+        self.first_frame_reported = True
+        time_to_first_frame = (time.monotonic() - PROCESS_START) * 1000
+        print(f"Startup: time to first frame sent={time_to_first_frame:.2f}ms "
+              f"(first camera frame at {(self.first_sample_time - PROCESS_START) * 1000:.2f}ms)")
+
     async def recv(self):
         start_time = time.time()
+        # Normally long finished, the pipeline starts while signaling runs
+        try:
+            await self.startup
+        except Exception as e:
+            # Without GStreamer there is nothing to send, end the track so aiortc
+            # stops calling recv() instead of spinning on black frames
+            print(f"GStreamer startup failed, stopping video track: {str(e)}")
+            self.stop()
+            raise MediaStreamError from e
         try:
             self.frame_count += 1
             print(f"Sending frame {self.frame_count}")
             # Wait for a new frame
-            for _ in range(10):
-                if self.latest_frame is not None:
-                    frame = self.latest_frame.copy()
-                    self.latest_frame = None
-                    break
-                await asyncio.sleep(0.01)
+            try:
+                await asyncio.wait_for(self.frame_ready.wait(), timeout=0.1)
+            except asyncio.TimeoutError:
+                pass
+            if self.latest_frame is not None:
+                frame = self.latest_frame.copy()
+                self.latest_frame = None
+                self.frame_ready.clear()
+                if not self.first_frame_reported:
+                    self.report_time_to_first_frame()
             else:
                 print("Failed to get frame from GStreamer, sending black frame")
                 frame = np.zeros((480, 640, 3), dtype=np.uint8)
@@ -214,5 +454,20 @@ async def main():
     camera_id = 0  # Change this to the appropriate camera ID
     await setup_webrtc_and_run(ip_address, port, camera_id)
 
+def event_loop_factory():
+    """Return the loop factory selected by EVENT_LOOP (None for the default loop)"""
+    if EVENT_LOOP == "glib":
+        import gbulb
+        gbulb.install()
+        print("Running asyncio on the GLib main loop (gbulb)")
+    elif EVENT_LOOP == "uvloop":
+        import uvloop
+        print("Running asyncio on uvloop")
+        return uvloop.new_event_loop
+    elif EVENT_LOOP != "asyncio":
+        raise ValueError(f"Unknown WEBRTC_EVENT_LOOP {EVENT_LOOP!r}, expected asyncio, uvloop or glib")
+    return None
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    with asyncio.Runner(loop_factory=event_loop_factory()) as runner:
+        runner.run(main())
\ No newline at end of file